@@ -0,0 +1,28 @@
+"""Per-segment formatting loop used by transcribe.py
+
+Kept in its own small, typed module so it can optionally be compiled to a C
+extension with mypyc (``mypyc _segloop.py``). Python imports the compiled
+module in place of this file when it is present and runs this file as-is
+otherwise, so nothing else changes either way.
+"""
+import io
+import queue
+from typing import Any, Callable
+
+# Transcript line: "[MM:SS.mmm] text" (bound once rather than parsing an
+# f-string's format specs on every segment)
+_format_line = "[{:02d}:{:06.3f}] {}".format
+
+def format_segments(segment_queue: "queue.Queue[Any]", buf: io.StringIO,
+                    on_progress: Callable[[int], None], progress_every: int = 10) -> int:
+    """Format queued segments into buf until a None arrives, returning the count"""
+    segment_count = 0
+    while (segment := segment_queue.get()) is not None:
+        if segment_count:
+            buf.write('\n')
+        minutes, seconds = divmod(segment.start, 60)
+        buf.write(_format_line(int(minutes), seconds, segment.text.strip()))
+        segment_count += 1
+        if segment_count % progress_every == 0:
+            on_progress(segment_count)
+    return segment_count
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Unit tests for transcribe.py that run without a real Whisper model,
+GPU or ffmpeg (run with: python -m pytest test_transcribe.py)
+"""
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import weakref
+from types import SimpleNamespace
+from unittest import mock
+
+import transcribe
+
+def make_segments(count, bad_index=None):
+    """Fake faster-whisper segments, 3.5s apart; bad_index gets text=None"""
+    return [
+        SimpleNamespace(start=i * 3.5, end=i * 3.5 + 3.0,
+                        text=None if i == bad_index else f" segment {i} ")
+        for i in range(count)
+    ]
+
+def run_with_timeout(func, timeout=10):
+    """Run func on a thread, returning (finished, result, error)"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), outcome.get("result"), outcome.get("error")
+
+class CollectSegmentsTest(unittest.TestCase):
+    def test_formats_timestamped_lines(self):
+        text, count = transcribe.collect_segments(iter(make_segments(25)))
+        lines = text.split("\n")
+        self.assertEqual(count, 25)
+        self.assertEqual(lines[0], "[00:00.000] segment 0")
+        self.assertEqual(lines[18], "[01:03.000] segment 18")
+        self.assertEqual(len(lines), 25)
+
+    def test_formatter_error_is_raised(self):
+        finished, _, error = run_with_timeout(
+            lambda: transcribe.collect_segments(iter(make_segments(5, bad_index=2))))
+        self.assertTrue(finished)
+        self.assertIsInstance(error, AttributeError)
+
+    def test_formatter_error_does_not_hang_on_full_queue(self):
+        # More segments than the queue holds: the producer must not block
+        # forever once the worker has died
+        finished, _, error = run_with_timeout(
+            lambda: transcribe.collect_segments(iter(make_segments(500, bad_index=3))))
+        self.assertTrue(finished, "collect_segments hung after the formatter failed")
+        self.assertIsInstance(error, AttributeError)
+
+class StandaloneScriptTest(unittest.TestCase):
+    def test_runs_without_segloop_module(self):
+        # transcribe.py alone (as older setups copy it) must still work
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copy(transcribe.__file__, tmp)
+            script = os.path.join(tmp, "transcribe.py")
+            probe = ("import io, queue, transcribe\n"
+                     "q = queue.Queue()\n"
+                     "q.put(type('S', (), {'start': 61.5, 'text': ' hi '})())\n"
+                     "q.put(None)\n"
+                     "buf = io.StringIO()\n"
+                     "print(transcribe.format_segments(q, buf, print), buf.getvalue())\n")
+            run = subprocess.run([sys.executable, "-c", probe], cwd=tmp,
+                                 capture_output=True, text=True, timeout=60)
+            self.assertEqual(run.stdout.strip(), "1 [01:01.500] hi", run.stderr)
+            usage = subprocess.run([sys.executable, script], cwd=tmp,
+                                   capture_output=True, text=True, timeout=60)
+            self.assertEqual(usage.returncode, 1)
+            self.assertIn("Usage", json.loads(usage.stdout)["error"])
+
+class CachedProbeTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_file = os.path.join(tmp.name, "mp3grabber_env.json")
+        patcher = mock.patch.object(transcribe, "PROBE_CACHE_FILE", self.cache_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        env = mock.patch.dict(os.environ)
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop("MP3GRABBER_REPROBE", None)
+
+        self.key = "cuda-12"
+        self.calls = 0
+
+        @transcribe.cached_probe(lambda: self.key)
+        def probe_gpu():
+            self.calls += 1
+            return True
+
+        self.probe = probe_gpu
+
+    def test_result_is_reused(self):
+        self.assertTrue(self.probe())
+        self.assertTrue(self.probe())
+        self.assertEqual(self.calls, 1)
+
+    def test_key_change_reprobes(self):
+        self.probe()
+        self.key = "cuda-13"
+        self.probe()
+        self.assertEqual(self.calls, 2)
+
+    def test_expired_result_reprobes(self):
+        self.probe()
+        with open(self.cache_file, encoding="utf-8") as f:
+            cache = json.load(f)
+        cache["probes"]["probe_gpu"]["time"] -= transcribe.PROBE_CACHE_MAX_AGE + 1
+        with open(self.cache_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        self.probe()
+        self.assertEqual(self.calls, 2)
+
+    def test_version_bump_reprobes(self):
+        self.probe()
+        with mock.patch.object(transcribe, "PROBE_CACHE_VERSION", transcribe.PROBE_CACHE_VERSION + 1):
+            self.probe()
+        self.assertEqual(self.calls, 2)
+
+    def test_reprobe_variable_forces_and_stores_fresh_result(self):
+        self.probe()
+        os.environ["MP3GRABBER_REPROBE"] = "1"
+        self.probe()
+        self.assertEqual(self.calls, 2)
+        del os.environ["MP3GRABBER_REPROBE"]
+        self.probe()
+        self.assertEqual(self.calls, 2)
+
+    def test_corrupt_cache_file_is_ignored(self):
+        with open(self.cache_file, "w", encoding="utf-8") as f:
+            f.write("{not json")
+        self.assertTrue(self.probe())
+        self.assertEqual(self.calls, 1)
+
+# Stand-in for ffmpeg: FAKE_FFMPEG_MODE picks what it writes to stdout/stderr
+FAKE_FFMPEG = """#!{python}
+import os, sys
+mode = os.environ["FAKE_FFMPEG_MODE"]
+if mode == "fail":
+    for i in range(200):
+        sys.stderr.write(f"noise line {{i}}\\n")
+    sys.stderr.write("Invalid data found when processing input\\n")
+    sys.exit(1)
+if mode == "pcm":
+    # Four distinct samples, repeated past one read chunk, plus a stray byte
+    pattern = (0).to_bytes(2, "little", signed=True) + (16384).to_bytes(2, "little", signed=True) \\
+        + (-32768).to_bytes(2, "little", signed=True) + (32767).to_bytes(2, "little", signed=True)
+    data = pattern * int(os.environ["FAKE_FFMPEG_REPEAT"]) + b"\\x01"
+    for start in range(0, len(data), 65537):
+        sys.stdout.buffer.write(data[start:start + 65537])
+"""
+
+@unittest.skipIf(os.name == "nt", "fake ffmpeg is a shell-executable script")
+class ExtractAudioTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ffmpeg = os.path.join(tmp.name, "ffmpeg")
+        with open(ffmpeg, "w") as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(ffmpeg, 0o755)
+        self.input_file = os.path.join(tmp.name, "input.mp3")
+        with open(self.input_file, "wb") as f:
+            f.write(b"\0" * 2000)
+        env = mock.patch.dict(os.environ, {"PATH": tmp.name + os.pathsep + os.environ.get("PATH", "")})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_decodes_pcm_larger_than_one_chunk(self):
+        # 4 samples * 2 bytes * repeat > PCM_CHUNK_BYTES, so the buffer grows
+        repeat = transcribe.PCM_CHUNK_BYTES // 8 + 1000
+        os.environ.update(FAKE_FFMPEG_MODE="pcm", FAKE_FFMPEG_REPEAT=str(repeat))
+        samples = transcribe.extract_audio(self.input_file)
+        # The trailing odd byte is dropped rather than misread as a sample
+        self.assertEqual(len(samples), repeat * 4)
+        self.assertEqual(str(samples.dtype), "float32")
+        self.assertEqual(samples[:4].tolist(), [0.0, 0.5, -1.0, 32767 / 32768])
+        self.assertEqual(samples[-4:].tolist(), samples[:4].tolist())
+
+    def test_failure_reports_stderr_tail(self):
+        os.environ["FAKE_FFMPEG_MODE"] = "fail"
+        with self.assertRaises(RuntimeError) as caught:
+            transcribe.extract_audio(self.input_file)
+        message = str(caught.exception)
+        self.assertTrue(message.startswith("ffmpeg failed: "))
+        self.assertIn("Invalid data found when processing input", message)
+        self.assertNotIn("noise line 0\n", message)
+        self.assertLessEqual(len(message), len("ffmpeg failed: ") + 500)
+
+    def test_no_output_is_an_error(self):
+        os.environ["FAKE_FFMPEG_MODE"] = "empty"
+        with self.assertRaisesRegex(RuntimeError, "no audio"):
+            transcribe.extract_audio(self.input_file)
+
+class ComputeTypeTest(unittest.TestCase):
+    def setUp(self):
+        env = mock.patch.dict(os.environ, {"WHISPER_COMPUTE_TYPE": "int8_float16"})
+        env.start()
+        self.addCleanup(env.stop)
+        supported = {"cpu": frozenset({"int8", "int8_float32", "int16", "float32"}),
+                     "cuda": frozenset({"float16", "int8_float16", "int8", "float32"})}
+        patcher = mock.patch.object(transcribe, "_supported_compute_types", supported.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        transcribe._compute_type_usable.cache_clear()
+        self.addCleanup(transcribe._compute_type_usable.cache_clear)
+
+    def test_override_applies_where_supported(self):
+        self.assertEqual(transcribe.get_compute_type(True), "int8_float16")
+
+    def test_override_ignored_on_cpu_fallback(self):
+        self.assertNotEqual(transcribe.get_compute_type(False), "int8_float16")
+        self.assertIn(transcribe.get_compute_type(False), {"int8", "int8_float32"})
+
+class TranscribeOptionsTest(unittest.TestCase):
+    def setUp(self):
+        env = mock.patch.dict(os.environ, {"MP3GRABBER_NO_VAD": "1"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_no_vad_disables_vad_filter(self):
+        self.assertNotIn("vad_filter", transcribe.get_transcribe_options(True))
+        self.assertNotIn("vad_filter", transcribe.get_transcribe_options(False))
+
+    def test_batched_pipeline_keeps_vad_filter(self):
+        options = transcribe.get_transcribe_options(True, batched=True)
+        self.assertTrue(options["vad_filter"])
+        self.assertIn("batch_size", options)
+
+class SaveTranscriptionTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.media_dir = os.path.join(self.tmp.name, "media")
+        self.transcriptions_dir = os.path.join(self.tmp.name, "transcriptions")
+        os.mkdir(self.media_dir)
+
+    def save(self):
+        return transcribe.save_transcription(
+            "[00:00.000] hello", os.path.join(self.media_dir, "talk.mp3"),
+            "cpu", "int8", "en", 0.95, "base")
+
+    def test_writes_header_and_transcript(self):
+        output_file = self.save()
+        with open(output_file, encoding="utf-8") as f:
+            content = f.read()
+        self.assertEqual(os.path.basename(output_file), "talk.txt")
+        self.assertIn("Source: talk.mp3", content)
+        self.assertTrue(content.endswith("--- TRANSCRIPTION ---\n[00:00.000] hello"))
+
+    def test_failed_write_leaves_no_temp_file(self):
+        with mock.patch.object(transcribe.os, "replace", side_effect=OSError("disk full")):
+            self.assertIsNone(self.save())
+        self.assertEqual(os.listdir(self.transcriptions_dir), [])
+
+class FakeWhisperModel:
+    """Stands in for faster_whisper.WhisperModel; float16 on CUDA runs out of memory"""
+    instances = []
+    # (compute_type, models still alive when it loaded) per load
+    loads = []
+
+    def __init__(self, model_size, device="cpu", compute_type="default", **kwargs):
+        self.device = device
+        self.compute_type = compute_type
+        alive = sum(ref() is not None for ref in FakeWhisperModel.instances)
+        FakeWhisperModel.loads.append((compute_type, alive))
+        FakeWhisperModel.instances.append(weakref.ref(self))
+
+    def transcribe(self, audio, **options):
+        if self.device == "cuda" and self.compute_type == "float16":
+            raise RuntimeError("CUDA failed with error out of memory")
+        return iter(make_segments(3)), SimpleNamespace(language="en", language_probability=0.9)
+
+class FakeModelTestCase(unittest.TestCase):
+    """Runs transcribe.py against FakeWhisperModel on a pretend GPU"""
+
+    def setUp(self):
+        FakeWhisperModel.instances = []
+        FakeWhisperModel.loads = []
+        transcribe.clear_model_cache()
+        self.results = []
+        self.tmp = tempfile.TemporaryDirectory()
+        fake_module = SimpleNamespace(WhisperModel=FakeWhisperModel)
+        for target, value in [
+            ("_faster_whisper", lambda: fake_module),
+            ("check_gpu_availability", lambda: True),
+            ("preload_cuda_libraries", lambda: ()),
+            ("prepare_audio", lambda audio_file: "samples"),
+            ("save_transcription", lambda *args, **kwargs: None),
+            ("emit_result", self.results.append),
+        ]:
+            patcher = mock.patch.object(transcribe, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        env = mock.patch.dict(os.environ)
+        env.start()
+        self.addCleanup(env.stop)
+        for name in ("WHISPER_COMPUTE_TYPE", "MP3GRABBER_MODEL"):
+            os.environ.pop(name, None)
+        self.addCleanup(transcribe.clear_model_cache)
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_audio_file(self, name="audio.mp3"):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(b"\0" * 2000)
+        return path
+
+    def assert_no_model_leaked(self):
+        # Every model must load only after the previous one was freed
+        self.assertGreater(len(FakeWhisperModel.loads), 1)
+        for compute_type, alive in FakeWhisperModel.loads:
+            self.assertEqual(alive, 0, f"{compute_type} model loaded while the failed model was alive")
+
+class OutOfMemoryFallbackTest(FakeModelTestCase):
+    def test_single_file_retries_with_int8_after_freeing_float16(self):
+        with mock.patch("sys.argv", ["transcribe.py", self.make_audio_file()]):
+            transcribe.main()
+        self.assertEqual(len(self.results), 1)
+        self.assertTrue(self.results[0]["success"])
+        self.assertEqual(self.results[0]["compute_type"], "int8_float16")
+        self.assert_no_model_leaked()
+
+    def test_serve_frees_float16_and_keeps_int8(self):
+        paths = [self.make_audio_file("a.mp3"), self.make_audio_file("b.mp3")]
+        with mock.patch("sys.stdin", io.StringIO("\n".join(paths) + "\n")):
+            transcribe.serve()
+        self.assertEqual([r["compute_type"] for r in self.results], ["int8_float16"] * 2)
+        self.assertTrue(all(r["success"] for r in self.results))
+        # float16, then one int8 model shared by both files
+        self.assertEqual([load[0] for load in FakeWhisperModel.loads], ["float16", "int8_float16"])
+        self.assert_no_model_leaked()
+
+    def test_batch_loads_fallback_once_and_frees_float16(self):
+        paths = [self.make_audio_file(f"{name}.mp3") for name in "abcde"]
+        results = list(transcribe.transcribe_many(paths))
+        self.assertEqual(sorted(r["source"] for r in results), sorted(paths))
+        self.assertTrue(all(r["success"] for r in results))
+        self.assertTrue(all(r["compute_type"] == "int8_float16" for r in results))
+        # Files failing together still load the int8 model only once
+        self.assertEqual([load[0] for load in FakeWhisperModel.loads], ["float16", "int8_float16"])
+        self.assert_no_model_leaked()
+
+class ServeTest(FakeModelTestCase):
+    def serve(self, *lines):
+        with mock.patch("sys.stdin", io.StringIO("".join(f"{line}\n" for line in lines))):
+            transcribe.serve()
+
+    def test_one_result_per_path(self):
+        path = self.make_audio_file()
+        missing = os.path.join(self.tmp.name, "missing.mp3")
+        self.serve(path, "", missing, path)
+        self.assertEqual([r["source"] for r in self.results], [path, missing, path])
+        self.assertEqual([r["success"] for r in self.results], [True, False, True])
+        self.assertIn("not found", self.results[1]["error"])
+
+    def test_failed_model_load_is_retried_for_the_next_file(self):
+        # Only the first download fails (e.g. the connection dropped)
+        attempts = []
+
+        def flaky_model(*args, **kwargs):
+            attempts.append(args)
+            if len(attempts) == 1:
+                raise OSError("Connection reset while downloading model")
+            return FakeWhisperModel(*args, **kwargs)
+
+        path = self.make_audio_file()
+        with mock.patch.object(transcribe, "_faster_whisper",
+                               lambda: SimpleNamespace(WhisperModel=flaky_model)), \
+                mock.patch.object(transcribe, "check_gpu_availability", lambda: False):
+            self.serve(path, path)
+        self.assertFalse(self.results[0]["success"])
+        self.assertIn("Connection reset", self.results[0]["error"])
+        self.assertTrue(self.results[1]["success"])
+        self.assertEqual(len(attempts), 2)
+
+class CudaLoadFailureTest(FakeModelTestCase):
+    """The GPU model fails to load while the audio is still being decoded"""
+
+    def setUp(self):
+        super().setUp()
+        self.loads = []
+
+        def broken_cuda_model(model_size, device="cpu", compute_type="default", **kwargs):
+            self.loads.append(device)
+            if device == "cuda":
+                raise RuntimeError("CUDA failed with error no CUDA-capable device is detected")
+            return FakeWhisperModel(model_size, device, compute_type, **kwargs)
+
+        def slow_prepare_audio(audio_file):
+            # Long enough for the background load to have failed already
+            time.sleep(0.2)
+            return "samples"
+
+        for target, value in [
+            ("_faster_whisper", lambda: SimpleNamespace(WhisperModel=broken_cuda_model)),
+            ("prepare_audio", slow_prepare_audio),
+        ]:
+            patcher = mock.patch.object(transcribe, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_single_file_falls_back_after_one_cuda_load(self):
+        with mock.patch("sys.argv", ["transcribe.py", self.make_audio_file()]):
+            transcribe.main()
+        self.assertTrue(self.results[0]["success"])
+        self.assertEqual(self.results[0]["device"], "cpu")
+        self.assertEqual(self.loads, ["cuda", "cpu"])
+
+    def test_cpu_fallback_honours_model_override(self):
+        os.environ["MP3GRABBER_MODEL"] = "medium"
+        with mock.patch("sys.argv", ["transcribe.py", self.make_audio_file()]):
+            transcribe.main()
+        self.assertEqual(self.results[0]["device"], "cpu")
+        self.assertEqual(self.results[0]["model_size"], "medium")
+
+    def test_batch_falls_back_after_one_cuda_load(self):
+        paths = [self.make_audio_file(f"{name}.mp3") for name in "abcde"]
+        results = list(transcribe.transcribe_many(paths))
+        self.assertTrue(all(r["success"] and r["device"] == "cpu" for r in results))
+        self.assertEqual(self.loads, ["cuda", "cpu"])
+
+if __name__ == "__main__":
+    unittest.main()
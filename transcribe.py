@@ -4,63 +4,577 @@ import os
 import warnings
 import json
 import time
-from datetime import datetime
-from faster_whisper import WhisperModel
+import subprocess
+import threading
+import queue
+import functools
+import gc
+import io
+import atexit
+import platform
+import shutil
+import tempfile
+import stat
+import logging
+import ctypes
+import importlib.util
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+try:
+    # Segment formatting loop; a mypyc-compiled build is used when present
+    from _segloop import format_segments
+except ImportError:
+    # Running standalone, without _segloop.py next to this file; this is the
+    # same loop in pure Python (keep the two in sync)
+    _format_line = "[{:02d}:{:06.3f}] {}".format
+    
+    def format_segments(segment_queue, buf, on_progress, progress_every=10):
+        """Format queued segments into buf until a None arrives, returning the count"""
+        segment_count = 0
+        while (segment := segment_queue.get()) is not None:
+            if segment_count:
+                buf.write('\n')
+            minutes, seconds = divmod(segment.start, 60)
+            buf.write(_format_line(int(minutes), seconds, segment.text.strip()))
+            segment_count += 1
+            if segment_count % progress_every == 0:
+                on_progress(segment_count)
+        return segment_count
+# numpy and faster_whisper are imported where they are used:
+# faster_whisper alone takes hundreds of ms (ctranslate2, onnxruntime, av),
+# which error exits should not pay and a worker thread can pay instead
+try:
+    # Optional: serializes multi-MB transcripts an order of magnitude faster
+    import orjson
+except ImportError:
+    orjson = None
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings("ignore", category=UserWarning)
 
-def transcribe_audio(audio_file, model_size="medium", use_gpu=True):
-    """Transcribe audio file using faster-whisper"""
+# Diagnostics go to stderr so stdout stays STATUS lines + the JSON result.
+# DEBUG output is opt-in via MP3GRABBER_DEBUG=1.
+logger = logging.getLogger("mp3grabber")
+logger.setLevel(logging.DEBUG if os.environ.get('MP3GRABBER_DEBUG') else logging.INFO)
+
+# Whisper models expect 16kHz mono input
+SAMPLE_RATE = 16000
+# Grow the PCM read buffer in 1 MB steps while ffmpeg streams into it
+PCM_CHUNK_BYTES = 1024 * 1024
+
+# Anything smaller cannot be a real audio/video file (matches relay.js)
+MIN_FILE_SIZE = 1000
+# Extensions we expect to see; others are attempted with a warning
+MEDIA_EXTENSIONS = {
+    '.mp3', '.wav', '.m4a', '.flac', '.ogg', '.webm', '.aac', '.opus',
+    '.mp4', '.mkv', '.avi', '.mov'
+}
+
+# Environment probe results are remembered across runs in this file; bump the
+# version whenever a probe changes so stale results are ignored
+PROBE_CACHE_FILE = os.path.join(tempfile.gettempdir(), "mp3grabber_env.json")
+PROBE_CACHE_VERSION = 4
+# Re-probe at least daily so driver/library changes are eventually noticed
+PROBE_CACHE_MAX_AGE = 24 * 60 * 60
+
+def _load_probe_cache():
+    """Read cached probe results, discarding them on version mismatch"""
     try:
-        # Determine device and compute type
-        device = "cuda" if use_gpu else "cpu"
-        # Use float32 for CPU to get better quality (int8 quantizes and reduces accuracy)
-        # For GPU, use float16 for speed/quality balance
-        compute_type = "float16" if use_gpu else "float32"
-        
-        print(f"STATUS:Initializing {device.upper()} processing...", flush=True)
-        
-        # Load model with timing
-        print(f"STATUS:Loading Whisper model ({model_size})...", flush=True)
-        print(f"STATUS:Checking cache (downloading if needed)...", flush=True)
-        
-        start_time = time.time()
-        model = WhisperModel(model_size, device=device, compute_type=compute_type)
-        load_time = time.time() - start_time
-        
-        # Determine if it was cached based on load time
-        # Cached models load very quickly (< 2s for GPU, < 3s for CPU)
-        if use_gpu:
-            is_cached = load_time < 2.0
-        else:
-            is_cached = load_time < 3.0
+        with open(PROBE_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get("version") == PROBE_CACHE_VERSION:
+            return cache
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {"version": PROBE_CACHE_VERSION, "probes": {}}
+
+def _save_probe_cache(cache):
+    """Persist probe results (best effort - a failed write only costs a re-probe)"""
+    tmp_file = f"{PROBE_CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, PROBE_CACHE_FILE)
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+def cached_probe(key_func, max_age=PROBE_CACHE_MAX_AGE):
+    """Cache a boolean environment probe across runs, keyed on key_func()
+    
+    The probe is re-run whenever the key changes (e.g. a different CUDA
+    install or Python environment), the result is older than max_age
+    seconds or MP3GRABBER_REPROBE=1 is set, otherwise the stored result is
+    reused.
+    """
+    def decorator(probe):
+        @functools.wraps(probe)
+        def wrapper():
+            key = key_func()
+            cache = _load_probe_cache()
+            entry = cache["probes"].get(probe.__name__)
+            if os.environ.get('MP3GRABBER_REPROBE') == '1':
+                # e.g. CUDA was just installed; the fresh result is stored
+                entry = None
+            if (entry is not None and entry.get("key") == key
+                    and time.time() - entry.get("time", 0) < max_age):
+                return entry["value"]
+            value = bool(probe())
+            cache["probes"][probe.__name__] = {"key": key, "value": value, "time": time.time()}
+            _save_probe_cache(cache)
+            return value
+        return wrapper
+    return decorator
+
+def _gpu_probe_key():
+    """Identify the machine, CUDA install and Python environment being probed"""
+    return [os.environ.get('CUDA_PATH'), platform.node(), sys.executable]
+
+class StatusEmitter:
+    """Batches STATUS lines into at most one stdout write per interval
+    
+    Every flushed write crosses the pipe to the Node parent, so lines that
+    arrive in quick succession (load phase, segment progress) are grouped.
+    A timer flushes whatever is pending so no line waits longer than the
+    interval. Writes are serialized, so it is safe to use from any thread.
+    """
+    
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.last_flush = 0.0
+        self.timer = None
+    
+    def emit(self, message):
+        with self.lock:
+            self.buffer.append(f"STATUS:{message}\n")
+            if time.monotonic() - self.last_flush >= self.interval:
+                self._flush_locked()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+    
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+    
+    def _flush_locked(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.buffer:
+            sys.stdout.write("".join(self.buffer))
+            sys.stdout.flush()
+            self.buffer.clear()
+        self.last_flush = time.monotonic()
+    
+    def write_bytes(self, *chunks):
+        """Write raw byte chunks to stdout after any pending STATUS lines
         
-        if is_cached:
-            print(f"STATUS:Model loaded from cache ({load_time:.1f}s)", flush=True)
+        Both happen under the lock, so the pending lines are never
+        interleaved with (or written after) the data.
+        """
+        with self.lock:
+            self._flush_locked()
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+
+_status = StatusEmitter()
+# Never lose buffered lines, whichever way the process exits
+atexit.register(_status.flush)
+
+def print_status(message):
+    """Queue a STATUS line for the Node side (safe to call from any thread)"""
+    _status.emit(message)
+
+def check_ffmpeg_available():
+    """Check if ffmpeg is on PATH (a lookup only - nothing is executed)"""
+    return shutil.which('ffmpeg') is not None
+
+def validate_input_file(file_path):
+    """Check that the input is a plausible media file using a single stat() call
+    
+    Returns (is_valid, error_message).
+    """
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return False, f"Audio file not found: {file_path}"
+    except OSError as e:
+        return False, f"Cannot access audio file: {e}"
+    
+    if not stat.S_ISREG(st.st_mode):
+        return False, f"Path is not a file: {file_path}"
+    
+    file_size = st.st_size
+    if file_size == 0:
+        return False, f"Audio file is empty: {file_path}"
+    if file_size < MIN_FILE_SIZE:
+        return False, f"File too small to be valid audio/video ({file_size} bytes): {file_path}"
+    
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in MEDIA_EXTENSIONS:
+        logger.warning("Unusual file extension '%s', attempting transcription anyway", ext)
+    
+    return True, None
+
+def _pcm16_to_f32(pcm):
+    """Scale int16 PCM samples to float32 in [-1, 1) with a single vectorized multiply"""
+    import numpy as np
+    out = np.empty(pcm.shape[0], dtype=np.float32)
+    np.multiply(pcm, np.float32(1.0 / 32768.0), out=out, casting='unsafe')
+    return out
+
+def _fadvise(file_path, advice):
+    """Give the kernel a page-cache hint for a whole file (no-op where unsupported)
+    
+    advice is the name of an os.POSIX_FADV_* constant, since those only
+    exist on platforms that have posix_fadvise.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def extract_audio(input_file):
+    """Decode input to 16kHz mono float32 samples by piping raw PCM out of ffmpeg"""
+    cmd = [
+        'ffmpeg', '-nostdin', '-i', input_file,
+        '-f', 's16le', '-ar', str(SAMPLE_RATE), '-ac', '1', '-acodec', 'pcm_s16le',
+        '-loglevel', 'error', 'pipe:1'
+    ]
+    # ffmpeg reads the input front to back exactly once: start read-ahead now
+    # and drop the pages once decoded so they don't crowd out model weights
+    _fadvise(input_file, 'POSIX_FADV_WILLNEED')
+    
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        # Drain stderr on a side thread so a chatty ffmpeg can never block on a
+        # full pipe while we read stdout; only the last few lines are kept
+        stderr_tail = deque(maxlen=20)
+        stderr_thread = threading.Thread(target=stderr_tail.extend, args=(proc.stderr,), daemon=True)
+        stderr_thread.start()
+        
+        # Read straight into a growing bytearray instead of a temp WAV file
+        buf = bytearray(PCM_CHUNK_BYTES)
+        size = 0
+        while True:
+            if size == len(buf):
+                buf.extend(bytes(PCM_CHUNK_BYTES))
+            with memoryview(buf) as view:
+                read = proc.stdout.readinto(view[size:])
+            if not read:
+                break
+            size += read
+        stderr_thread.join()
+    
+    if proc.returncode != 0:
+        stderr = b"".join(stderr_tail).decode('utf-8', errors='replace').strip()
+        raise RuntimeError(f"ffmpeg failed: {stderr[-500:]}")
+    if size < 2:
+        raise RuntimeError("ffmpeg produced no audio (file may not contain an audio track)")
+    
+    _fadvise(input_file, 'POSIX_FADV_DONTNEED')
+    
+    import numpy as np
+    return _pcm16_to_f32(np.frombuffer(buf, dtype=np.int16, count=size // 2))
+
+# Preferred CPU compute types, fastest first. The int8 variants let
+# CTranslate2 use VNNI/BF16 int8 GEMM kernels where the CPU supports them.
+CPU_COMPUTE_TYPES = ("int8_bfloat16", "int8_float16", "int8_float32", "int8")
+
+@functools.lru_cache(maxsize=None)
+def _supported_compute_types(device):
+    """Compute types CTranslate2 supports on a device (None if it cannot tell)"""
+    try:
+        import ctranslate2
+        return frozenset(ctranslate2.get_supported_compute_types(device))
+    except Exception:
+        return None
+
+@functools.lru_cache(maxsize=None)
+def _pick_cpu_compute_type():
+    """Pick the fastest int8 compute type this CPU supports"""
+    supported = _supported_compute_types("cpu")
+    if supported is None:
+        return "int8"
+    for compute_type in CPU_COMPUTE_TYPES:
+        if compute_type in supported:
+            return compute_type
+    return "int8"
+
+@functools.lru_cache(maxsize=None)
+def _compute_type_usable(compute_type, device):
+    """Check a WHISPER_COMPUTE_TYPE value against a device, warning once if not"""
+    supported = _supported_compute_types(device)
+    if compute_type == "auto" or supported is None or compute_type in supported:
+        return True
+    logger.warning("WHISPER_COMPUTE_TYPE=%s is not supported on %s, using the default",
+                   compute_type, device.upper())
+    return False
+
+def get_compute_type(use_gpu):
+    """Pick the CTranslate2 compute type for the target device"""
+    # WHISPER_COMPUTE_TYPE overrides the choice ("auto" lets CTranslate2
+    # pick the fastest type the device supports) where the device can run
+    # it - a GPU type like int8_float16 must not break the CPU fallback
+    override = os.environ.get('WHISPER_COMPUTE_TYPE')
+    if override and _compute_type_usable(override, "cuda" if use_gpu else "cpu"):
+        return override
+    # For GPU, use float16 for speed/quality balance
+    # For CPU, use the best int8 kernel available
+    return "float16" if use_gpu else _pick_cpu_compute_type()
+
+def _cpu_threads(num_workers):
+    """Intra-op threads per CTranslate2 worker for CPU inference
+    
+    Uses every core unless OMP_NUM_THREADS is set (relay.js limits it on
+    Windows to avoid crashes during model load), in which case 0 lets
+    CTranslate2 honour it.
+    """
+    if os.environ.get('OMP_NUM_THREADS'):
+        return 0
+    return max(1, (os.cpu_count() or 1) // num_workers)
+
+@functools.lru_cache(maxsize=None)
+def _faster_whisper():
+    """Import faster-whisper on first use"""
+    import faster_whisper
+    return faster_whisper
+
+@functools.lru_cache(maxsize=4)
+def _get_model(model_size, device, compute_type, num_workers=1):
+    """Construct a WhisperModel, reusing one already built with the same settings"""
+    cpu_threads = _cpu_threads(num_workers) if device == "cpu" else 0
+    return _faster_whisper().WhisperModel(model_size, device=device, compute_type=compute_type,
+                                          cpu_threads=cpu_threads, num_workers=num_workers)
+
+# Default models: distil-large-v3 is faster than medium on GPU (6 decoder
+# layers instead of 24) and at least as accurate on English speech; "base"
+# keeps CPU runs practical. MP3GRABBER_MODEL overrides both (e.g. "medium"
+# for better non-English accuracy).
+GPU_MODEL_SIZE = "distil-large-v3"
+CPU_MODEL_SIZE = "base"
+
+def get_model_size(use_gpu):
+    """Pick the Whisper model to load for the target device"""
+    return os.environ.get('MP3GRABBER_MODEL') or (GPU_MODEL_SIZE if use_gpu else CPU_MODEL_SIZE)
+
+@functools.lru_cache(maxsize=4)
+def _get_batched_pipeline(model):
+    """Wrap a model in a BatchedInferencePipeline, once per model"""
+    return _faster_whisper().BatchedInferencePipeline(model=model)
+
+def clear_model_cache():
+    """Drop cached models (and their pipelines) and free their memory"""
+    _get_batched_pipeline.cache_clear()
+    _get_model.cache_clear()
+    # CTranslate2 releases VRAM when the model object is collected; do it now
+    # rather than whenever the cycle collector next runs
+    gc.collect()
+    # Only touch torch if something already imported it (and used CUDA)
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_initialized():
+        torch.cuda.empty_cache()
+
+def load_model(model_size="medium", use_gpu=True, num_workers=1, compute_type=None):
+    """Load a faster-whisper model, reporting whether it came from cache"""
+    device = "cuda" if use_gpu else "cpu"
+    compute_type = compute_type or get_compute_type(use_gpu)
+    
+    print_status(f"Initializing {device.upper()} processing...")
+    
+    if use_gpu:
+        # Fail before any weights are loaded if the CUDA libraries are broken
+        # (the probe result may come from an earlier run's cache)
+        missing = preload_cuda_libraries()
+        if missing:
+            raise RuntimeError(f"CUDA libraries could not be loaded: {', '.join(missing)}")
+    
+    # Load model with timing
+    print_status(f"Loading Whisper model ({model_size})...")
+    print_status("Checking cache (downloading if needed)...")
+    
+    start_time = time.time()
+    model = _get_model(model_size, device, compute_type, num_workers)
+    load_time = time.time() - start_time
+    
+    # Determine if it was cached based on load time
+    # Cached models load very quickly (< 2s for GPU, < 3s for CPU)
+    if use_gpu:
+        is_cached = load_time < 2.0
+    else:
+        is_cached = load_time < 3.0
+    
+    if is_cached:
+        print_status(f"Model loaded from cache ({load_time:.1f}s)")
+    else:
+        print_status(f"Model downloaded and loaded ({load_time:.1f}s)")
+    
+    return model
+
+def collect_segments(segments, label=None):
+    """Format segments into timestamped transcript lines
+    
+    faster-whisper decodes lazily as the generator is advanced, so this
+    thread only pulls segments and a worker does the string formatting,
+    keeping the decoder busy. label (e.g. the file name) is added to the
+    progress lines. Returns (transcript_text, segment_count).
+    """
+    # Stream lines into a StringIO - repeated += copies the whole transcript
+    # on every segment, and a list of lines holds a second copy until joined
+    buf = io.StringIO()
+    segment_queue = queue.Queue(maxsize=64)
+    
+    suffix = f" ({label})" if label else ""
+    
+    def report_progress(segment_count):
+        print_status(f"Processed {segment_count} segments{suffix}...")
+    
+    errors = []
+    
+    def run_formatter():
+        try:
+            # Progress update every 10 segments
+            format_segments(segment_queue, buf, report_progress, 10)
+        except BaseException as e:
+            errors.append(e)
+            # Keep draining so a producer blocked on the full queue wakes up,
+            # sees the error and stops
+            while segment_queue.get() is not None:
+                pass
+    
+    formatter = threading.Thread(target=run_formatter, daemon=True)
+    formatter.start()
+    segment_count = 0
+    try:
+        for segment in segments:
+            if errors:
+                break
+            segment_queue.put(segment)
+            segment_count += 1
+    finally:
+        # Always release the worker, even if decoding raised
+        segment_queue.put(None)
+        formatter.join()
+    
+    if errors:
+        # A formatting (or status output) failure must fail the transcription,
+        # not return a transcript cut off where the worker died
+        raise errors[0]
+    
+    return buf.getvalue(), segment_count
+
+# Number of 30s VAD chunks decoded together by the batched GPU pipeline.
+# 16 fits in 8 GB of VRAM; larger cards can raise it via MP3GRABBER_BATCH_SIZE.
+DEFAULT_BATCH_SIZE = 16
+
+def _env_int(name, default):
+    """Read a positive integer setting from the environment"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        parsed = int(value)
+        if parsed < 1:
+            raise ValueError(value)
+        return parsed
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r, using %d", name, value, default)
+        return default
+
+def get_transcribe_options(use_gpu, batched=False):
+    """Build the keyword arguments for model.transcribe()"""
+    # Beam search multiplies decoder work by the beam width. Greedy decoding
+    # (1) is several times faster on CPU, where the decoder dominates, for a
+    # small accuracy cost. The batched pipeline gets its throughput from
+    # batching chunks instead, so it is greedy too; only the unbatched GPU
+    # path (older faster-whisper) keeps 5 beams.
+    default_beam = 5 if use_gpu and not batched else 1
+    beam_size = _env_int('MP3GRABBER_BEAM', default_beam)
+    options = {
+        "beam_size": beam_size,
+        "best_of": beam_size,
+        # Conditioning on the previous segment's text serializes decoding
+        # and feeds Whisper's repetition loops on long recordings
+        "condition_on_previous_text": False,
+    }
+    
+    if not use_gpu:
+        # No temperature fallback on CPU: a low-confidence window would
+        # otherwise be decoded again at up to five rising temperatures
+        options["temperature"] = [0.0]
+    
+    # Silero VAD strips silence before inference, so pauses in podcasts and
+    # lectures are never run through the encoder (MP3GRABBER_NO_VAD=1 to skip).
+    # The batched pipeline always keeps it: its chunks come from the VAD, and
+    # without them it rejects audio longer than 30s
+    if batched or os.environ.get('MP3GRABBER_NO_VAD') != '1':
+        options["vad_filter"] = True
+        options["vad_parameters"] = {"min_silence_duration_ms": 500}
+    
+    if batched:
+        # The batched pipeline decodes several (VAD) chunks per forward pass
+        options["batch_size"] = _env_int('MP3GRABBER_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    
+    # A known language skips the detection pass over the first 30s
+    language = os.environ.get('MP3GRABBER_LANG')
+    if language:
+        options["language"] = language
+    
+    return options
+
+def transcribe_audio(audio, model_size="medium", use_gpu=True, model_future=None, compute_type=None,
+                     label=None):
+    """Transcribe audio (file path or 16kHz float32 samples) using faster-whisper
+    
+    If model_future is given, the model is taken from it (loaded in the
+    background while audio was being extracted) instead of loaded here.
+    label names the file in progress lines when several run at once.
+    """
+    # Determine device and compute type
+    device = "cuda" if use_gpu else "cpu"
+    compute_type = compute_type or get_compute_type(use_gpu)
+    try:
+        if model_future is not None:
+            model = model_future.result()
         else:
-            print(f"STATUS:Model downloaded and loaded ({load_time:.1f}s)", flush=True)
+            model = load_model(model_size, use_gpu, compute_type=compute_type)
+        
+        # On GPU, batch chunks through one forward pass when supported
+        # (BatchedInferencePipeline only exists in faster-whisper >= 1.1)
+        batched = use_gpu and hasattr(_faster_whisper(), "BatchedInferencePipeline")
+        if batched:
+            model = _get_batched_pipeline(model)
+        
+        options = get_transcribe_options(use_gpu, batched)
+        if batched:
+            print_status(f"Using batched inference (batch size {options['batch_size']})")
+        if "language" in options:
+            print_status(f"Language set to '{options['language']}', skipping detection")
         
-        print(f"STATUS:Starting transcription...", flush=True)
+        print_status("Starting transcription...")
         # Transcribe
-        segments, info = model.transcribe(audio_file, beam_size=5)
+        segments, info = model.transcribe(audio, **options)
         
-        print(f"STATUS:Processing segments...", flush=True)
-        # Collect segments with timestamps
-        transcript_text = ""
-        segment_count = 0
-        for segment in segments:
-            start_time = segment.start
-            end_time = segment.end
-            # Format timestamps as [MM:SS.mmm]
-            start_formatted = f"[{int(start_time//60):02d}:{start_time%60:06.3f}]"
-            end_formatted = f"[{int(end_time//60):02d}:{end_time%60:06.3f}]"
-            transcript_text += f"{start_formatted} {segment.text.strip()}\n"
-            segment_count += 1
-            if segment_count % 10 == 0:  # Progress update every 10 segments
-                print(f"STATUS:Processed {segment_count} segments...", flush=True)
+        print_status("Processing segments...")
+        transcript_text, segment_count = collect_segments(segments, label)
         
-        print(f"STATUS:Transcription complete!", flush=True)
+        print_status("Transcription complete!")
         
         return {
             "success": True,
@@ -83,51 +597,136 @@ def transcribe_audio(audio_file, model_size="medium", use_gpu=True):
             "model_size": model_size
         }
 
+# CUDA libraries CTranslate2 loads on first GPU use: (Windows, Linux) names
+CUDA_LIBRARIES = {
+    "cublas": ("cublas64_12.dll", "libcublas.so.12"),
+    "cudnn": ("cudnn64_9.dll", "libcudnn.so.9"),
+}
+
+def _load_cuda_library(package, lib_name):
+    """Load a CUDA library from the system search path or its nvidia-* pip package"""
+    # winmode=0 restores the PATH search that relay.js relies on for the DLLs
+    load_kwargs = {"winmode": 0} if os.name == "nt" else {}
+    try:
+        ctypes.CDLL(lib_name, **load_kwargs)
+        return True
+    except OSError:
+        pass
+    
+    # pip wheels (nvidia-cublas-cu12, nvidia-cudnn-cu12) ship the library
+    # inside the package rather than on the search path
+    spec = _find_module(f"nvidia.{package}")
+    for location in (spec.submodule_search_locations or []) if spec else []:
+        for subdir in ("bin", "lib"):
+            candidate = os.path.join(location, subdir, lib_name)
+            if os.path.exists(candidate):
+                try:
+                    ctypes.CDLL(candidate, **load_kwargs)
+                    return True
+                except OSError:
+                    pass
+    return False
+
+# CUDA runtime, used to count devices when CTranslate2 cannot be asked
+CUDA_RUNTIME_LIBRARY = "cudart64_12.dll" if os.name == "nt" else "libcudart.so.12"
+
+def _find_module(name):
+    """Locate a module without importing it (None if it is not installed)"""
+    try:
+        return importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        # A missing parent package raises instead of returning None
+        return None
+
+def _cuda_runtime_device_count():
+    """Count CUDA devices through the CUDA runtime, or None if it is missing"""
+    try:
+        runtime = ctypes.CDLL(CUDA_RUNTIME_LIBRARY)
+    except OSError:
+        return None
+    count = ctypes.c_int(0)
+    if runtime.cudaGetDeviceCount(ctypes.byref(count)) != 0:
+        return 0
+    return count.value
+
+@functools.lru_cache(maxsize=None)
+def preload_cuda_libraries():
+    """Load cuBLAS/cuDNN up front, returning the names of any that failed
+    
+    WhisperModel(...) on CUDA can succeed and then crash on the first
+    transcribe() call when these are missing; loading them first turns that
+    into an early, clean CPU fallback before weights go to VRAM.
+    """
+    index = 0 if os.name == "nt" else 1
+    missing = []
+    for package, names in CUDA_LIBRARIES.items():
+        if not _load_cuda_library(package, names[index]):
+            missing.append(names[index])
+    return tuple(missing)
+
+def _cuda_libraries_loadable():
+    """Check that the CUDA libraries can actually be loaded"""
+    missing = preload_cuda_libraries()
+    if missing:
+        logger.debug("CUDA libraries failed to load: %s", ", ".join(missing))
+        return False
+    logger.debug("CUDA libraries loaded successfully")
+    return True
+
+@cached_probe(_gpu_probe_key)
 def check_gpu_availability():
     """Check if GPU libraries are available"""
-    # Debug: print what we're checking
-    print("DEBUG:Checking GPU availability...", flush=True)
+    logger.debug("Checking GPU availability...")
     
-    # First try torch (most reliable)
+    # Ask CTranslate2 (already loaded by faster-whisper) for CUDA devices;
+    # this needs no model load and no torch import
     try:
-        import torch
-        print(f"DEBUG:torch imported, cuda available: {torch.cuda.is_available()}", flush=True)
-        if torch.cuda.is_available():
-            print("DEBUG:GPU available via torch.cuda", flush=True)
-            return True
-    except ImportError as e:
-        print(f"DEBUG:torch not available: {e}", flush=True)
-        pass
+        import ctranslate2
+        device_count = ctranslate2.get_cuda_device_count()
+        logger.debug("CTranslate2 sees %d CUDA device(s)", device_count)
+        if device_count == 0:
+            return False
+        return _cuda_libraries_loadable()
+    except Exception as e:
+        logger.debug("CTranslate2 CUDA query failed: %s", e)
     
-    # Then try CUDA libraries
-    try:
-        import nvidia.cublas
-        import nvidia.cudnn
-        print("DEBUG:CUDA libraries imported successfully", flush=True)
-        # If we can import both, assume GPU is available
+    # Then ask the CUDA runtime directly (importing torch for this would
+    # load hundreds of MB of libraries just to answer one question)
+    device_count = _cuda_runtime_device_count()
+    if device_count is not None:
+        logger.debug("CUDA runtime sees %d CUDA device(s)", device_count)
+        return device_count > 0 and _cuda_libraries_loadable()
+    
+    # Then look for the CUDA library wheels, without importing them
+    if _find_module("nvidia.cublas") and _find_module("nvidia.cudnn"):
+        logger.debug("CUDA library packages found")
+        # If we can load both, assume GPU is available
         # The actual transcription will fallback to CPU if GPU fails
-        return True
-    except ImportError as e:
-        print(f"DEBUG:CUDA libraries not available: {e}", flush=True)
-        return False
+        return _cuda_libraries_loadable()
+    logger.debug("CUDA libraries not available")
+    return False
+
+@functools.lru_cache(maxsize=None)
+def get_transcriptions_dir(media_dir):
+    """Return the transcriptions folder next to a media folder, creating it once"""
+    # Cached so mkdir's stat runs once per folder per process rather than
+    # once per file (a network round trip on shared drives)
+    transcriptions_dir = Path(media_dir) / ".." / "transcriptions"
+    transcriptions_dir.mkdir(parents=True, exist_ok=True)
+    return transcriptions_dir
 
 def save_transcription(transcript, audio_file, device, compute_type, language, confidence, model_size):
     """Save transcription to transcriptions folder"""
     try:
-        # Get base filename without extension
-        base_name = os.path.splitext(os.path.basename(audio_file))[0]
-        
-        # Create transcriptions directory if it doesn't exist
-        transcriptions_dir = os.path.join(os.path.dirname(audio_file), "..", "transcriptions")
-        os.makedirs(transcriptions_dir, exist_ok=True)
+        source = Path(audio_file)
         
         # Create output file path
-        output_file = os.path.join(transcriptions_dir, f"{base_name}.txt")
+        output_file = str(get_transcriptions_dir(source.parent) / f"{source.stem}.txt")
         
         # Create header with metadata
         header = f"""Transcription Results
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-Source: {os.path.basename(audio_file)}
+Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}
+Source: {source.name}
 Device: {device.upper()}
 Compute Type: {compute_type}
 Model Size: {model_size}
@@ -136,38 +735,190 @@ Language: {language} ({confidence:.1%} confidence)
 --- TRANSCRIPTION ---
 """
         
-        # Write to file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(header)
-            f.write(transcript)
+        # Encode once and write the bytes in one go to a temp file, then
+        # rename it into place so a crash never leaves a half-written file
+        payload = memoryview((header + transcript).encode('utf-8', errors='replace'))
+        tmp_file = output_file + ".tmp"
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            try:
+                while payload:
+                    payload = payload[os.write(fd, payload):]
+            finally:
+                os.close(fd)
+            os.replace(tmp_file, output_file)
+        except BaseException:
+            # Don't leave a partial .tmp file in the transcriptions folder
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            raise
         
         return output_file
     except Exception as e:
         return None
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print(json.dumps({"success": False, "error": "Usage: python transcribe.py <audio_file>"}))
-        sys.exit(1)
+def emit_result(result):
+    """Write the result as one compact UTF-8 JSON line on stdout"""
+    if orjson is not None:
+        # Same compact UTF-8 output as the json fallback below
+        payload = orjson.dumps(result)
+    else:
+        payload = json.dumps(result, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    # Pending STATUS lines go out first; the newline is written separately
+    # rather than copying a multi-MB payload to append it
+    _status.write_bytes(payload, b'\n')
+
+def is_cuda_error(error):
+    """Check whether an error message points at a broken CUDA setup"""
+    return "CUDA" in error or "cudnn" in error.lower() or "cublas" in error.lower()
+
+# GPU compute type to retry with when float16 does not fit: int8 weights take
+# about half the VRAM
+GPU_LOW_MEMORY_COMPUTE_TYPE = "int8_float16"
+
+def is_out_of_memory_error(error):
+    """Check whether an error message is the GPU running out of memory"""
+    return "out of memory" in error.lower()
+
+def fallback_model(model_size, use_gpu, compute_type, error):
+    """Pick the (model_size, use_gpu, compute_type) to retry a failed file with
     
-    audio_file = sys.argv[1]
-    if not os.path.exists(audio_file):
-        print(json.dumps({"success": False, "error": f"Audio file not found: {audio_file}"}))
-        sys.exit(1)
+    Out of VRAM first tries the smaller int8 weights on the GPU; any other
+    CUDA error goes to the CPU. Returns None when there is nothing to retry.
+    """
+    if not use_gpu:
+        return None
+    if is_out_of_memory_error(error) and compute_type != GPU_LOW_MEMORY_COMPUTE_TYPE:
+        return model_size, True, GPU_LOW_MEMORY_COMPUTE_TYPE
+    if is_cuda_error(error):
+        return get_model_size(False), False, None
+    return None
+
+class ModelSlot:
+    """The model shared by every file of a run, replaceable after a failure
     
-    # Check GPU availability first
-    gpu_available = check_gpu_availability()
+    The slot holds the only long-lived reference to the model, so when a
+    file needs a fallback model the failed one really is released (and its
+    VRAM freed) before the replacement is loaded. Files borrow the model
+    through use(); a replacement waits until no file is using the old model
+    and holds new ones back until it is done. Replacements are skipped if
+    another file already replaced the same model, so files that fail
+    together load the fallback only once.
+    """
     
-    # Try GPU first if available, otherwise use CPU
-    # Use "medium" model for GPU, "base" model for CPU (better performance on CPU)
-    if gpu_available:
-        result = transcribe_audio(audio_file, model_size="medium", use_gpu=True)
-        if not result["success"] and ("CUDA" in result["error"] or "cudnn" in result["error"].lower() or "cublas" in result["error"].lower()):
-            # Fallback to CPU if GPU fails
-            result = transcribe_audio(audio_file, model_size="base", use_gpu=False)
-    else:
-        # Use CPU directly with base model
-        result = transcribe_audio(audio_file, model_size="base", use_gpu=False)
+    def __init__(self, model_size, use_gpu, executor=None, num_workers=1):
+        self.condition = threading.Condition()
+        self.users = 0
+        self.replacing = False
+        self.num_workers = num_workers
+        self.generation = 0
+        self._load(model_size, use_gpu, None, executor)
+    
+    def _load(self, model_size, use_gpu, compute_type, executor=None):
+        self.model_size = model_size
+        self.use_gpu = use_gpu
+        self.compute_type = compute_type or get_compute_type(use_gpu)
+        args = (load_model, model_size, use_gpu, self.num_workers, self.compute_type)
+        if executor is not None:
+            # Load in the background while the first file is being decoded
+            self.future = executor.submit(*args)
+            return
+        # Replacements load right away: every file is waiting for them, and
+        # a pool thread might not be free to do it
+        self.future = Future()
+        try:
+            self.future.set_result(args[0](*args[1:]))
+        except Exception as e:
+            self.future.set_exception(e)
+    
+    @contextmanager
+    def use(self):
+        """Borrow (generation, model_size, use_gpu, compute_type, model_future)"""
+        with self.condition:
+            self.condition.wait_for(lambda: not self.replacing)
+            self.users += 1
+            current = (self.generation, self.model_size, self.use_gpu, self.compute_type, self.future)
+        try:
+            yield current
+        finally:
+            with self.condition:
+                self.users -= 1
+                self.condition.notify_all()
+    
+    def replace(self, generation, model_size, use_gpu, compute_type=None):
+        """Swap in another model, unless this generation was already replaced"""
+        with self.condition:
+            if generation != self.generation or self.replacing:
+                return
+            self.replacing = True
+            try:
+                # Other files may still be running on the old model; freeing
+                # it under them would not release its memory anyway
+                self.condition.wait_for(lambda: self.users == 0)
+                # Release the failed model before its replacement is loaded
+                self.future = None
+                clear_model_cache()
+                self.generation += 1
+                self._load(model_size, use_gpu, compute_type)
+            finally:
+                self.replacing = False
+                self.condition.notify_all()
+
+def prepare_audio(audio_file):
+    """Decode the file to 16kHz float32 samples once, up front
+    
+    Decoding once means faster-whisper gets samples in memory, and a CPU
+    fallback does not have to decode the file again. ffmpeg is used when
+    available, otherwise faster-whisper's own PyAV decoder. If both fail the
+    path is returned, so transcription reports the decoder's error.
+    """
+    print_status("Extracting audio track...")
+    if check_ffmpeg_available():
+        try:
+            return extract_audio(audio_file)
+        except Exception as e:
+            logger.warning("ffmpeg extraction failed, decoding with PyAV: %s", e)
+    
+    try:
+        from faster_whisper.audio import decode_audio
+        return decode_audio(audio_file, sampling_rate=SAMPLE_RATE)
+    except Exception as e:
+        logger.warning("PyAV decoding failed: %s", e)
+        return audio_file
+
+def process_file(audio_file, slot, label=None):
+    """Transcribe one validated file with the slot's model and save it
+    
+    On GPU errors the slot is switched to a fallback model (int8 weights,
+    then the CPU) and the file retried; later files keep the fallback.
+    """
+    audio = prepare_audio(audio_file)
+    
+    while True:
+        with slot.use() as (generation, model_size, use_gpu, compute_type, model_future):
+            result = transcribe_audio(audio, model_size=model_size, use_gpu=use_gpu,
+                                      model_future=model_future, compute_type=compute_type,
+                                      label=label)
+            load_failed = model_future.done() and model_future.exception() is not None
+            # Only the slot may keep the model alive, or a replacement
+            # cannot free its VRAM
+            model_future = None
+        if result["success"]:
+            break
+        
+        fallback = fallback_model(model_size, use_gpu, compute_type, result["error"])
+        if fallback is None:
+            if load_failed:
+                # Nothing to fall back to, but the load itself failed (e.g. a
+                # network error during the first download): load again so
+                # the next file does not get the same stored error
+                slot.replace(generation, model_size, use_gpu, compute_type)
+            break
+        if fallback[2] == GPU_LOW_MEMORY_COMPUTE_TYPE:
+            print_status(f"GPU out of memory, retrying with {fallback[2]}...")
+        slot.replace(generation, *fallback)
     
     # Save transcription if successful
     if result["success"]:
@@ -183,4 +934,111 @@ if __name__ == "__main__":
         if output_file:
             result["output_file"] = output_file
     
-    print(json.dumps(result))
+    return result
+
+def transcribe_many(audio_files, model_size=None, use_gpu=None):
+    """Transcribe several files with one shared model, yielding each result when done
+    
+    CTranslate2 releases the GIL while decoding, so files are processed on a
+    thread pool against a single model instance instead of one process (and
+    one model load) per file. Results come in completion order; each carries
+    its "source" path.
+    """
+    if use_gpu is None:
+        use_gpu = check_gpu_availability()
+    if model_size is None:
+        model_size = get_model_size(use_gpu)
+    
+    if use_gpu:
+        # Two files in flight keep the GPU busy without doubling VRAM use
+        workers = min(len(audio_files), 2)
+    else:
+        # Cores are split between workers; keep ~4 intra-op threads each
+        workers = min(len(audio_files), max(1, (os.cpu_count() or 1) // 4))
+    workers = max(workers, 1)
+    
+    def run_one(audio_file):
+        is_valid, error = validate_input_file(audio_file)
+        if not is_valid:
+            return {"success": False, "error": error, "source": audio_file}
+        result = process_file(audio_file, slot, label=os.path.basename(audio_file))
+        result["source"] = audio_file
+        return result
+    
+    # One extra thread loads the model (with a CTranslate2 worker per file
+    # thread, so decodes run concurrently) while the first files are decoded
+    with ThreadPoolExecutor(max_workers=workers + 1) as executor:
+        slot = ModelSlot(model_size, use_gpu, executor, num_workers=workers)
+        futures = [executor.submit(run_one, audio_file) for audio_file in audio_files]
+        for future in as_completed(futures):
+            yield future.result()
+
+def serve():
+    """Keep one model loaded and transcribe each file path read from stdin
+    
+    Writes one JSON result line per input line, so a long-lived parent
+    process pays the model load (and CUDA init) only once.
+    """
+    use_gpu = check_gpu_availability()
+    model_size = get_model_size(use_gpu)
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # After a GPU failure the slot keeps the fallback model, so later
+        # files go straight to it instead of failing on the GPU again
+        slot = ModelSlot(model_size, use_gpu, executor)
+        print_status("Ready for audio file paths on stdin")
+        
+        for line in sys.stdin:
+            audio_file = line.strip()
+            if not audio_file:
+                continue
+            
+            is_valid, error = validate_input_file(audio_file)
+            if not is_valid:
+                emit_result({"success": False, "error": error, "source": audio_file})
+                continue
+            
+            result = process_file(audio_file, slot)
+            result["source"] = audio_file
+            emit_result(result)
+
+def main():
+    logging.basicConfig(stream=sys.stderr, format='[%(levelname)s] %(message)s')
+    
+    if len(sys.argv) < 2:
+        emit_result({"success": False, "error": "Usage: python transcribe.py <audio_file> [<audio_file> ...] | --serve"})
+        sys.exit(1)
+    
+    if sys.argv[1:] == ["--serve"]:
+        serve()
+        return
+    
+    if len(sys.argv) > 2:
+        # Batch mode: one JSON result line per input file, as each finishes
+        for result in transcribe_many(sys.argv[1:]):
+            emit_result(result)
+        return
+    
+    audio_file = sys.argv[1]
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Probe the GPU (CUDA library loading is the slow part) while the
+        # input file is checked; neither depends on the other
+        gpu_future = executor.submit(check_gpu_availability)
+        
+        is_valid, error = validate_input_file(audio_file)
+        if not is_valid:
+            emit_result({"success": False, "error": error})
+            sys.exit(1)
+        
+        gpu_available = gpu_future.result()
+        model_size = get_model_size(gpu_available)
+        
+        # Load the model in the background while ffmpeg decodes the audio;
+        # the two are independent, so wall-clock is max(load, extract)
+        result = process_file(audio_file, ModelSlot(model_size, gpu_available, executor))
+    
+    emit_result(result)
+
+if __name__ == "__main__":
+    main()